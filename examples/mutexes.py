@@ -22,87 +22,225 @@ which could lead to a deadlock.
 This example collects the traces leading to a deadlock situation.
 """
 
-from functools import partial
+import argparse
+import collections
+import os
 from typing import TypeAlias
 
 from simsched.core import SimThread
-from simsched.engine import SimDeadlock
-from simsched.lib import Mutex
-from simsched.runner import LoopController, RunStats, simsched
-
-Event: TypeAlias = tuple[int, str]
-Trace: TypeAlias = tuple[Event, ...]
-TraceBuffer: TypeAlias = list[Event]
-
+from simsched.engine import SimDeadlock, SimThreadConstructor
+from simsched.lib import Cell, Mutex
+from simsched.runner import (
+    LoopController,
+    RunStats,
+    simsched,
+    simsched_parallel,
+)
+
+# Events are encoded as small ints to keep the traces compact: the event id is
+# `tid * NR_EVENTS + op`, and the human-readable label is decoded only when
+# printing the results.
+#
+# The whole trace is packed into a single int while running: each event is
+# shifted in as EVENT_BITS-wide digit on top of EMPTY_TRACE marker, so the key
+# is updated in O(1) per event and is exact (no collisions) for deduplication.
+# The events are recorded on every run: recording only on demand would require
+# replaying the deadlocked schedule, i.e. saving the `random` state before each
+# run, which costs much more than packing a dozen events.
+Event: TypeAlias = int
+ThreadEvents: TypeAlias = tuple[Event, Event, Event, Event]
+Trace: TypeAlias = int
+TraceBuffer: TypeAlias = Cell[Trace]
+
+# per-thread event ops
+LOCK_X, LOCK_Y, UNLOCK_Y, UNLOCK_X = range(4)
+NR_EVENTS = 4
+
+# trace packing, 3 threads with 4 events each fit into 4-bit digits
+EVENT_BITS = 4
+EVENT_MASK = (1 << EVENT_BITS) - 1
+EMPTY_TRACE = 1
+
+
+def thread(
+    x: Mutex,
+    y: Mutex,
+    events: ThreadEvents,
+    trace: TraceBuffer,
+) -> SimThread:
+    """Lock two mutexes.
+
+    The event ids are precomputed by the caller with `thread_events`.
+    """
+    lock_x, lock_y, unlock_y, unlock_x = events
 
-def thread(tid: int, x: Mutex, y: Mutex, trace: TraceBuffer) -> SimThread:
-    """Lock two mutexes."""
     yield from x.lock()
-    trace.append((tid, f"LOCK {x.label}"))
+    trace.val = trace.val << EVENT_BITS | lock_x
     yield from y.lock()
-    trace.append((tid, f"LOCK {y.label}"))
+    trace.val = trace.val << EVENT_BITS | lock_y
 
     yield from y.unlock()
-    trace.append((tid, f"UNLOCK {y.label}"))
+    trace.val = trace.val << EVENT_BITS | unlock_y
     yield from x.unlock()
-    trace.append((tid, f"UNLOCK {x.label}"))
+    trace.val = trace.val << EVENT_BITS | unlock_x
 
 
-def demo() -> None:
-    """Simulate the classic deadlock problem."""
-    mtx_a = Mutex(label="A")
-    mtx_b = Mutex(label="B")
-    mtx_c = Mutex(label="C")
+def thread_events(tid: int) -> ThreadEvents:
+    """Event ids for the thread in the op order."""
+    base = tid * NR_EVENTS
+    return base + LOCK_X, base + LOCK_Y, base + UNLOCK_Y, base + UNLOCK_X
+
+
+def decode_trace(trace: Trace) -> list[Event]:
+    """Unpack the trace into the list of events in the original order."""
+    events = []
+    while trace != EMPTY_TRACE:
+        events.append(trace & EVENT_MASK)
+        trace >>= EVENT_BITS
+
+    events.reverse()
+    return events
+
+
+def event_lines(tid: int, xlabel: str, ylabel: str) -> list[str]:
+    """Printable trace lines for the thread events in the op order.
+
+    Lines are indented to the thread's column of the trace table.
+    """
+    indent = " " * 20 * tid
+    return [
+        f"{indent}LOCK {xlabel}",
+        f"{indent}LOCK {ylabel}",
+        f"{indent}UNLOCK {ylabel}",
+        f"{indent}UNLOCK {xlabel}",
+    ]
+
+
+# labels of mutexes to lock for each thread, the order allows circular deadlock
+THREADS = (("A", "B"), ("B", "C"), ("C", "A"))
+
+# cap of the collected deadlocks to keep the memory bounded for long runs
+MAX_DEADLOCKS = 1_000_000
+
 
-    tracebuf: TraceBuffer = []
-    deadlocks: set[Trace] = set()
+def simulate(nr_runs: int) -> tuple[RunStats, dict[Trace, int]]:
+    """Run the simulation for the given number of runs.
+
+    Returns the run stats and the observed deadlock traces with their counts.
+    """
+    mutexes = {label: Mutex(label=label) for label in "ABC"}
+    tracebuf: TraceBuffer = Cell(EMPTY_TRACE)
+    deadlocks: dict[Trace, int] = {}
 
     def looper(stats: RunStats) -> LoopController:
         """Collect deadlock states."""
         yield  # first run
         while True:
-            if stats.last == SimDeadlock():
-                trace = tuple(tracebuf)
-                new = trace not in deadlocks
-                deadlocks.add(trace)
-                if new:
-                    print(f"-> deadlock discovered ({len(deadlocks)} total)")
+            if isinstance(stats.last, SimDeadlock):
+                # the only per-run work is a lookup of the int key
+                trace = tracebuf.val
+                if trace in deadlocks:
+                    deadlocks[trace] += 1
+                else:
+                    deadlocks[trace] = 1
+
+                # Deadlocked threads keep their mutexes locked, release them.
+                # Completed runs unlock everything by themselves.
+                for mtx in mutexes.values():
+                    mtx.locked = False
 
             # clear the state before the next run
-            mtx_a.locked = False
-            mtx_b.locked = False
-            mtx_c.locked = False
-            tracebuf.clear()
+            tracebuf.val = EMPTY_TRACE
+
+            if stats.total >= nr_runs:
+                return
+
             yield
 
+    def thread_ctr(tid: int, xlabel: str, ylabel: str) -> SimThreadConstructor:
+        """Create the constructor for the thread."""
+        x, y = mutexes[xlabel], mutexes[ylabel]
+        events = thread_events(tid)
+
+        def ctr() -> SimThread:
+            return thread(x, y, events, tracebuf)
+
+        return ctr
+
+    threads = [thread_ctr(tid, x, y) for tid, (x, y) in enumerate(THREADS)]
+    stats = simsched(threads, looper)
+    return stats, deadlocks
+
+
+def demo(*, jobs: int = 1) -> None:
+    """Simulate the classic deadlock problem."""
+    # LRU order, the least recently seen ones are evicted on overflow
+    deadlocks: collections.OrderedDict[Trace, int] = collections.OrderedDict()
+    evicted = 0
+
     print("Demo - mutexes")
-    print("Classic deadlock with 3 threads")
+    print(f"Classic deadlock with 3 threads, {jobs} worker processes")
     print("Hit Ctrl+C to stop simulation")
     print("Running...")
 
-    t0 = partial(thread, 0, mtx_a, mtx_b, tracebuf)
-    t1 = partial(thread, 1, mtx_b, mtx_c, tracebuf)
-    t2 = partial(thread, 2, mtx_c, mtx_a, tracebuf)
-    stats = simsched((t0, t1, t2), looper)
+    def collect(wdeadlocks: dict[Trace, int], _: RunStats) -> None:
+        """Merge the deadlocks found by a worker."""
+        nonlocal evicted
+        for trace, count in wdeadlocks.items():
+            if trace in deadlocks:
+                deadlocks[trace] += count
+                deadlocks.move_to_end(trace)
+                continue
+
+            if len(deadlocks) >= MAX_DEADLOCKS:
+                deadlocks.popitem(last=False)
+                evicted += 1
+
+            deadlocks[trace] = count
+            print(f"-> deadlock discovered ({len(deadlocks)} stored)")
+
+    stats = simsched_parallel(simulate, collect, jobs=jobs)
+
+    # decoding table for the event ids
+    lines = [
+        line
+        for tid, (x, y) in enumerate(THREADS)
+        for line in event_lines(tid, x, y)
+    ]
 
     print()
     print(f"total({stats.total}) = ok({stats.ok}) + lock({stats.deadlock})")
     print("observed the following deadlocks:")
-    for i, deadlock in enumerate(sorted(deadlocks), 1):
+    if evicted:
+        print(f"({evicted} least recently seen deadlocks were evicted)")
+    for i, (deadlock, count) in enumerate(deadlocks.items(), 1):
         print(f"========================== #{i} ==========================")
         print("T0", " " * 16, "T1", " " * 16, "T2")
         print("--------------------------------------------------------")
 
-        for tid, line in deadlock:
-            print(" " * 20 * tid + line)
+        for event in decode_trace(deadlock):
+            print(lines[event])
 
         print(">>>>>>>>>>>>>>>>>>> D E A D L O C K <<<<<<<<<<<<<<<<<<<")
+        print(f"(happened {count} times)")
         print()
 
 
 def main() -> None:
     """CLI entrypoint."""
-    demo()
+    parser = argparse.ArgumentParser(description="Mutexes deadlock demo.")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: %(default)s)",
+    )
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("the number of jobs must be positive")
+
+    demo(jobs=args.jobs)
 
 
 if __name__ == "__main__":
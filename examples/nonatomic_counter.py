@@ -22,76 +22,139 @@ could lead to pretty unpredictable results based on the scheduler behavior.
 This example collects the observed counter values in a simulation.
 """
 
-import collections
-from collections.abc import MutableMapping
+import argparse
+import os
+from array import array
+from collections.abc import MutableSequence
 from functools import partial
-import sys
+from typing import TypeAlias
 
 from simsched.core import SimThread, schedule
-from simsched.runner import LoopController, RunStats, simsched
-from simsched.lib import Cell
+from simsched.runner import (
+    LoopController,
+    RunStats,
+    simsched,
+    simsched_parallel,
+)
 
+# the counter is kept in a single-item list to make it mutable
+Counter: TypeAlias = list[int]
 
-def bad_inc_thread(counter: Cell[int], nr_incs: int) -> SimThread:
+
+def bad_inc_thread(counter: Counter, nr_incs: int) -> SimThread:
     """Non-atomic incrementer."""
-    for _ in range(nr_incs):
-        val = counter.val
+    # plain countdown is cheaper than range iterator for a few iterations
+    while nr_incs > 0:
+        val = counter[0]
         yield from schedule()
-        counter.val = val + 1
+        counter[0] = val + 1
+        nr_incs -= 1
 
 
-def demo(nr_threads: int = 5, nr_incs: int = 3) -> None:
-    """Run non-atomic counter increment demo with params."""
+def simulate(
+    nr_threads: int,
+    nr_incs: int,
+    nr_runs: int,
+) -> tuple[RunStats, MutableSequence[int]]:
+    """Run the simulation for the given number of runs.
+
+    Returns the run stats and the counts of observed counter values, indexed
+    by the value.
+    """
     # create environment to keep between simulation runs
-    counter = Cell(0)
-    outputs: MutableMapping[int, int] = collections.defaultdict(int)
+    counter: Counter = [0]
+    # the counter could not exceed the total amount of increments, so
+    # observed values are counted in a flat array indexed by the value (the
+    # negative counts mean no increments at all)
+    max_value = max(nr_threads * nr_incs, 0)
+    outputs: MutableSequence[int] = array("q", [0] * (max_value + 1))
 
     # define the looper object to control the execution loop
     def looper(stats: RunStats) -> LoopController:
         """Controller for the execution."""
         yield  # first run
         while True:
-            if stats.total % 5000 == 0:
-                print(f"total: {stats.total}, outputs: {len(outputs)}")
-
             # collect the current output result
-            outputs[counter.val] += 1
+            outputs[counter[0]] += 1
 
             # reset the counter value before next run
-            counter.val = 0
+            counter[0] = 0
+
+            if stats.total >= nr_runs:
+                return
+
             yield  # schedule next run
 
+    def thrdctr() -> SimThread:
+        return bad_inc_thread(counter, nr_incs)
+
+    # run the simsched tool
+    stats = simsched((thrdctr,) * nr_threads, looper)
+    return stats, outputs
+
+
+def demo(nr_threads: int = 5, nr_incs: int = 3, *, jobs: int = 1) -> None:
+    """Run non-atomic counter increment demo with params."""
+    max_value = max(nr_threads * nr_incs, 0)
+    outputs: MutableSequence[int] = array("q", [0] * (max_value + 1))
+
     print("Demo - non-atomic counter")
-    print(f"threads: {nr_threads}, increments: {nr_incs}")
+    print(f"threads: {nr_threads}, increments: {nr_incs}, workers: {jobs}")
     print("Hit Ctrl+C to stop simulation")
     print("Running...")
 
-    # run the simsched tool
-    thrdctr = partial(bad_inc_thread, counter, nr_incs)
-    simsched((thrdctr for _ in range(nr_threads)), looper)
+    def collect(woutputs: MutableSequence[int], stats: RunStats) -> None:
+        """Merge the values observed by a worker."""
+        for val, count in enumerate(woutputs):
+            outputs[val] += count
+
+        observed = sum(1 for count in outputs if count)
+        print(f"total: {stats.total}, outputs: {observed}")
+
+    simsched_parallel(
+        partial(simulate, nr_threads, nr_incs),
+        collect,
+        jobs=jobs,
+    )
 
     print()
     print("The following counter values have been observed")
-    for val, count in sorted(outputs.items()):
-        print(f"{val:2}: {count}")
+    for val, count in enumerate(outputs):
+        if count:
+            print(f"{val:2}: {count}")
 
 
 def main() -> None:
     """CLI entrypoint."""
-    prog, *args = sys.argv
-    try:
-        match args:
-            case []:
-                demo()
-            case [nr_threads]:
-                demo(int(nr_threads))
-            case [nr_threads, nr_incs]:
-                demo(int(nr_threads), int(nr_incs))
-            case _:
-                raise ValueError
-    except Exception:
-        print(f"usage: {prog} [THREADS [INCREMENTS]]")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Non-atomic counter demo.")
+    parser.add_argument(
+        "nr_threads",
+        metavar="THREADS",
+        type=int,
+        nargs="?",
+        default=5,
+        help="number of incrementer threads (default: %(default)s)",
+    )
+    parser.add_argument(
+        "nr_incs",
+        metavar="INCREMENTS",
+        type=int,
+        nargs="?",
+        default=3,
+        help="increments per thread (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: %(default)s)",
+    )
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("the number of jobs must be positive")
+
+    demo(args.nr_threads, args.nr_incs, jobs=args.jobs)
 
 
 if __name__ == "__main__":
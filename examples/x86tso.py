@@ -31,35 +31,88 @@ https://www.cl.cam.ac.uk/~pes20/weakmemory/ecoop10.pdf
 
 import collections
 import contextlib
-import itertools
 import sys
 from collections.abc import Iterable, MutableMapping
 from dataclasses import dataclass, field
 from functools import partial
 from io import StringIO
-from typing import Callable, Mapping, Protocol, Self, TypeAlias
+from typing import Any, Callable, ClassVar, Mapping, Protocol, Self, TypeAlias
 
-from simsched.core import SimThread, cond_schedule, schedule
-from simsched.engine import SimThreadConstructor
+from simsched.core import Predicate, SimThread, cond_schedule, schedule
+from simsched.engine import SimOk, SimThreadConstructor
 from simsched.lib import Cell, Mutex, RxChannel, TxChannel, create_channel
-from simsched.runner import LoopController, RunStats, simsched
+from simsched.runner import (
+    LoopController,
+    RunStats,
+    ScheduleExplorer,
+    simsched,
+)
 
 
-# Use real dataclasses instead of typing.NewType for pattern matching
-@dataclass(frozen=True)
-class Addr:
-    addr: str
+class Name(str):
+    """Interned name of some location.
 
+    Use real classes instead of typing.NewType for pattern matching. Names are
+    str subclasses interned per type: hashing and comparing them is done by
+    C-level str code (the hash is cached and equal names are the same object),
+    as they are used as dict keys on every memory and register access.
+
+    The str value is prefixed with the tag of the name kind, so the names of
+    different kinds (and plain strings) never compare or hash equal, e.g.
+    `Addr("counter") != Reg("counter")` and `Addr("x") != "x"`.
+    """
+
+    __slots__ = ()
+    _pool: ClassVar[dict[str, Self]]
+    _tag: ClassVar[str]
+
+    def __init_subclass__(cls, *, tag: str) -> None:
+        cls._pool = {}
+        cls._tag = tag
+
+    def __new__(cls, name: str) -> Self:
+        try:
+            return cls._pool[name]
+        except KeyError:
+            obj = cls._pool[name] = super().__new__(cls, cls._tag + name)
+            return obj
+
+    @property
+    def name(self) -> str:
+        """The name without the kind tag."""
+        return self[len(self._tag) :]
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
 
-@dataclass(frozen=True)
-class Reg:
-    reg: str
 
+class Addr(Name, tag="addr:"):
+    """Memory address."""
+
+    __slots__ = ()
+
+
+class Reg(Name, tag="reg:"):
+    """Processor register."""
+
+    __slots__ = ()
+
+
+# Names used all over the demos. Equal names are interned, but creating one
+# still goes through `Name.__new__`, so the frequent ones are built once here.
+EAX, EBX, ECX, EDX = Reg("eax"), Reg("ebx"), Reg("ecx"), Reg("edx")
+TMP = Reg("tmp")
+X, Y = Addr("x"), Addr("y")
 
 Memory: TypeAlias = MutableMapping[Addr, int]
 Registers: TypeAlias = MutableMapping[Reg, int]
 
 
+def nop() -> SimThread:
+    """Empty simthread for operations completed without scheduling."""
+    yield from ()
+
+
 @dataclass
 class Processor:
     """Single execution unit in the TSO model."""
@@ -69,96 +122,120 @@ class Processor:
     tx: TxChannel
     regs: Registers = field(default_factory=dict)
 
+    # wakeup predicates for `cond_schedule`, built once per processor instead
+    # of creating a new closure on every load and fence
+    _can_load: Predicate = field(init=False, repr=False, compare=False)
+    _is_flushed: Predicate = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._can_load = lambda: not self.lock.locked
+        self._is_flushed = lambda: not self.tx.buf
+
     def wrap(self, t: Callable[[Self], SimThread]) -> SimThread:
         """Wrap the program with closing storebuffer thread."""
         yield from t(self)
-        yield from self.tx.send(None)
+
+        # The program is done, so there is nothing to interleave with. Put
+        # the finish signal directly instead of going through `tx.send` with
+        # its extra generators and scheduling point.
+        self.tx.buf.append(None)
 
     def _lookup(self, addr: Addr) -> int:
         """Get the value by addr."""
-        # first lookup the newest store in the local storebuffer
-        for a, val in reversed(self.tx.buf):
-            if addr == a:
-                return val
+        # first lookup the newest store in the local storebuffer, it is
+        # usually empty or holds a couple of stores, so the scan is cheap
+        buf = self.tx.buf
+        if buf:
+            for a, val in reversed(buf):
+                if addr is a:  # names are interned
+                    return val
 
         # if not in the storebuffer, then lookup the memory
-        return self.mem[addr]
+        return self.mem.get(addr, 0)
+
+    # Thin wrappers return the underlying simthread instead of delegating with
+    # `yield from`: every resume walks the whole delegation chain, so a frame
+    # less in the chain makes each scheduling point cheaper.
 
     def _memlock(self) -> SimThread:
         """Lock the memory system."""
-        yield from self.lock.lock(owner=self)
+        return self.lock.lock(owner=self)
 
     def _memunlock(self) -> SimThread:
         """Unlock the memory system."""
         yield from self.mfence()  # flushing the self store buffer is a must
         yield from self.lock.unlock()
 
-    def mov(self, dst: Addr | Reg, src: Addr | Reg | int) -> SimThread:
-        """Intel-like x86 `mov` assembly instruction."""
-        match (dst, src):
-            case (Addr(), Addr()):
-                raise ValueError("x86 does not allow `mov` from mem to mem")
+    def _store(self, addr: Addr, val: int) -> SimThread:
+        """Store the value to memory."""
+        # Store operations go through store buffer. The buffer is unbounded,
+        # so the store is a plain append, and only the scheduling point of
+        # `tx.send` is kept (without its generator frame).
+        self.tx.buf.append((addr, val))
+        return schedule()
+
+    def _load(self, reg: Reg, addr: Addr) -> SimThread:
+        """Load the value from memory to the register."""
+        # load operations are allowed only when memory is not locked
+        yield from cond_schedule(self._can_load)
+        self.regs[reg] = self._lookup(addr)
+
+    def _xchg_mem(self, addr: Addr, reg: Reg) -> SimThread:
+        """Exchange the values of memory and register."""
+        # xchg is implicitly locked
+        yield from self._memlock()
 
-            case (Addr() as addr, Reg() as reg):
-                # store operations go through store buffer
-                val = self.regs[reg]
-                yield from self.tx.send((addr, val))
+        # get both values
+        aval = self._lookup(addr)
+        rval = self.regs[reg]
 
-            case (Addr() as addr, int(val)):
-                # store operations go through store buffer
-                yield from self.tx.send((addr, val))
+        # set value to register immediately, and send to memory
+        self.regs[reg] = aval
+        self.tx.buf.append((addr, rval))
+        yield from schedule()
 
-            case (Reg() as reg, Addr() as addr):
-                # load operations are allowed only when memory is not locked
-                yield from cond_schedule(lambda: not self.lock.locked)
-                self.regs[reg] = self._lookup(addr)
+        yield from self._memunlock()
 
-            case (Reg() as dstreg, Reg() as srcreg):
-                # local operations could be done atomic
-                self.regs[dstreg] = self.regs[srcreg]
+    # The instructions below are not generators themselves: the operands are
+    # dispatched once per call by their exact types and the specialized
+    # simthread is returned to be used with `yield from`. Local operations are
+    # done atomically right away.
 
-            case (Reg() as reg, int(val)):
-                # local operations could be done atomic
-                self.regs[reg] = val
+    def mov(self, dst: Addr | Reg, src: Addr | Reg | int) -> SimThread:
+        """Intel-like x86 `mov` assembly instruction."""
+        try:
+            op = _MOV_DISPATCH[type(dst), type(src)]
+        except KeyError:
+            # immediates of int subclasses (e.g. bool) are dispatched as int
+            imm = isinstance(src, int)
+            op = _MOV_DISPATCH.get((type(dst), int)) if imm else None
+            if op is None:
+                msg = f"invalid `mov` operands: {dst!r}, {src!r}"
+                raise ValueError(msg) from None
+        return op(self, dst, src)
 
     def mfence(self) -> SimThread:
         """Intel-like `mfence` assembly instruction."""
-        yield from cond_schedule(lambda: not self.tx.buf)
+        return cond_schedule(self._is_flushed)
 
     def xchg(self, dst: Addr | Reg, src: Addr | Reg) -> SimThread:
         """Intel-like x86 `xchg` assembly instruction."""
-        match (dst, src):
-            case (Addr(), Addr()):
-                raise ValueError("x86 does not allow `xchg` from mem to mem")
-
-            case (Addr() as a, Reg() as r) | (Reg() as r, Addr() as a):
-                # xchg is implicitly locked
-                yield from self._memlock()
-
-                # get both values
-                aval = self._lookup(a)
-                rval = self.regs[r]
-
-                # set value to register immediately, and send to memory
-                self.regs[r] = aval
-                yield from self.tx.send((a, rval))
-
-                yield from self._memunlock()
-
-            case (Reg() as dstreg, Reg() as srcreg):
-                # local operations could be done atomic
-                x, y = self.regs[dstreg], self.regs[srcreg]
-                self.regs[dstreg], self.regs[srcreg] = y, x
+        try:
+            op = _XCHG_DISPATCH[type(dst), type(src)]
+        except KeyError:
+            msg = f"invalid `xchg` operands: {dst!r}, {src!r}"
+            raise ValueError(msg) from None
+        return op(self, dst, src)
 
     def inc(self, location: Addr) -> SimThread:
         """Non-atomic memory increment."""
-        assert Reg("tmp") not in self.regs, "sanity check"
+        assert TMP not in self.regs, "sanity check"
 
-        yield from self.mov(Reg("tmp"), location)
-        self.regs[Reg("tmp")] += 1
-        yield from self.mov(location, Reg("tmp"))
+        yield from self.mov(TMP, location)
+        self.regs[TMP] += 1
+        yield from self.mov(location, TMP)
 
-        self.regs.pop(Reg("tmp"))  # cleanup
+        self.regs.pop(TMP)  # cleanup
 
     def lock_xadd(self, location: Addr, reg: Reg) -> SimThread:
         """Atomic memory addition."""
@@ -185,6 +262,73 @@ class Processor:
         ret.val = old
 
 
+# Operand handlers for `mov` and `xchg`, keyed by the exact operand types. The
+# names are interned `str` subclasses, so `type()` tells the kind of operand.
+Operation: TypeAlias = Callable[[Processor, Any, Any], SimThread]
+
+
+def _mov_mem_mem(p: Processor, dst: Addr, src: Addr) -> SimThread:
+    raise ValueError("x86 does not allow `mov` from mem to mem")
+
+
+def _mov_store_reg(p: Processor, addr: Addr, reg: Reg) -> SimThread:
+    return p._store(addr, p.regs[reg])
+
+
+def _mov_store_imm(p: Processor, addr: Addr, val: int) -> SimThread:
+    return p._store(addr, val)
+
+
+def _mov_load(p: Processor, reg: Reg, addr: Addr) -> SimThread:
+    return p._load(reg, addr)
+
+
+def _mov_reg_reg(p: Processor, dst: Reg, src: Reg) -> SimThread:
+    p.regs[dst] = p.regs[src]
+    return nop()
+
+
+def _mov_reg_imm(p: Processor, reg: Reg, val: int) -> SimThread:
+    p.regs[reg] = val
+    return nop()
+
+
+_MOV_DISPATCH: dict[tuple[type, type], Operation] = {
+    (Addr, Addr): _mov_mem_mem,
+    (Addr, Reg): _mov_store_reg,
+    (Addr, int): _mov_store_imm,
+    (Reg, Addr): _mov_load,
+    (Reg, Reg): _mov_reg_reg,
+    (Reg, int): _mov_reg_imm,
+}
+
+
+def _xchg_mem_mem(p: Processor, dst: Addr, src: Addr) -> SimThread:
+    raise ValueError("x86 does not allow `xchg` from mem to mem")
+
+
+def _xchg_mem_reg(p: Processor, addr: Addr, reg: Reg) -> SimThread:
+    return p._xchg_mem(addr, reg)
+
+
+def _xchg_reg_mem(p: Processor, reg: Reg, addr: Addr) -> SimThread:
+    return p._xchg_mem(addr, reg)
+
+
+def _xchg_reg_reg(p: Processor, dst: Reg, src: Reg) -> SimThread:
+    regs = p.regs
+    regs[dst], regs[src] = regs[src], regs[dst]
+    return nop()
+
+
+_XCHG_DISPATCH: dict[tuple[type, type], Operation] = {
+    (Addr, Addr): _xchg_mem_mem,
+    (Addr, Reg): _xchg_mem_reg,
+    (Reg, Addr): _xchg_reg_mem,
+    (Reg, Reg): _xchg_reg_reg,
+}
+
+
 @dataclass
 class TSO:
     """Class representing TSO memory model state."""
@@ -202,7 +346,7 @@ class TSO:
         defmem: Mapping[Addr, int] = {},
     ) -> None:
         """Class constructor."""
-        self.mem = collections.defaultdict(int)
+        self.mem = {}  # uninitialized memory is read as zero
         self.lock = Mutex()
         self.sbctrs = []
         self.procs = []
@@ -213,31 +357,38 @@ class TSO:
             tx, rx = create_channel()
             proc = Processor(self.mem, self.lock, tx)
             self.procs.append(proc)
-            self.sbctrs.append(partial(self.storebuffer, rx, proc))
+            can_flush = self._flush_predicate(proc)
+            self.sbctrs.append(partial(self.storebuffer, rx, can_flush))
 
         # initialize memory
         self.mem.update(self.defmem)
 
-    def storebuffer(self, rx: RxChannel, proc: Processor) -> SimThread:
+    def _flush_predicate(self, proc: Processor) -> Predicate:
+        """Create the wakeup predicate for the storebuffer of the processor."""
+        return lambda: not self.lock.locked or self.lock.owner is proc
+
+    def storebuffer(self, rx: RxChannel, can_flush: Predicate) -> SimThread:
         """Pseudo-thread for flushing store buffer."""
-        # memory store instruction or finish signal
-        cell: Cell[tuple[Addr, int] | None] = Cell(None)
+        # The buffer is accessed directly instead of `rx.peek` into a `Cell`:
+        # wait for the head and read it in place, no extra frame or object.
+        buf = rx.buf
+
+        def has_stores() -> bool:
+            return bool(buf)
 
         while True:
             # Do not consume the value, just peek. We need to store the value
             # in the buffer as hwthread may try to read from pending stores.
-            yield from rx.peek(cell)
-            match cell.val:
+            yield from cond_schedule(has_stores)
+            match buf[0]:  # memory store instruction or finish signal
                 case (addr, value):
                     # can flush values only when the memory is not locked
-                    yield from cond_schedule(
-                        lambda: not self.lock.locked or self.lock.owner is proc
-                    )
+                    yield from cond_schedule(can_flush)
                     self.mem[addr] = value
-                    rx.consume()  # now the value is flushed, we can remove it
+                    buf.popleft()  # now the value is flushed, we can remove it
                 case None:
                     # finish signal, done
-                    rx.consume()
+                    buf.popleft()
                     return
 
     def reinit(self) -> None:
@@ -255,29 +406,49 @@ NamedSnapshot: TypeAlias = tuple[tuple[str, int], ...]
 SnapshotCollector = Callable[[], Snapshot]
 
 
+# number of snapshots to buffer before counting them
+OBSERVED_BATCH = 4096
+
+
 @dataclass
 class ObservedStats:
-    """Class to store observed outputs."""
+    """Class to store observed outputs.
 
-    storage: MutableMapping[Snapshot, int] = field(
-        default_factory=lambda: collections.defaultdict(int)
+    Snapshots are not counted one by one, they are buffered and counted in
+    batches by C-accelerated `Counter.update`. Call `flush` before reading the
+    storage.
+    """
+
+    storage: collections.Counter[Snapshot] = field(
+        default_factory=collections.Counter
     )
+    pending: list[Snapshot] = field(default_factory=list)
 
     def add(self, snapshot: Snapshot) -> None:
         """Add observed output to the collection."""
-        self.storage[snapshot] += 1
-
-    def describe(self, inames: Iterable[str]) -> str:
-        """Provide human-readable string."""
-        names = list(inames)
-
-        lines = []
-        for snap, count in sorted(self.storage.items()):
-            namedsnap = zip(names, snap)
-            snapline = ", ".join(f"{name} = {val}" for name, val in namedsnap)
-            lines.append(f"{snapline}: {count}")
-
-        return "\n".join(lines)
+        self.pending.append(snapshot)
+        if len(self.pending) >= OBSERVED_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        """Count all the pending snapshots."""
+        self.storage.update(self.pending)
+        self.pending.clear()
+
+    def describe(self, inames: Iterable[str], *, counts: bool = True) -> str:
+        """Provide human-readable string, optionally with the counts."""
+        self.flush()
+
+        # the names are the same for all the snapshots, so build the line
+        # template once and only fill in the values for each snapshot
+        fmt = ", ".join(f"{name} = {{}}" for name in inames)
+        if counts:
+            fmt += ": {}"
+
+        return "\n".join(
+            fmt.format(*snap, count)
+            for snap, count in sorted(self.storage.items())
+        )
 
 
 def reg_count_looper(
@@ -285,14 +456,29 @@ def reg_count_looper(
     collector: SnapshotCollector,
     tso: TSO,
     iters: int,
+    until: Snapshot | None,
+    explorer: ScheduleExplorer | None,
     stats: RunStats,
 ) -> LoopController:
     """Common looper for most of the TSO demos.
 
-    Collects registers on each loop and put snapshots into storage.
+    Collects registers on each loop and put snapshots into storage. If `until`
+    snapshot is provided, then stops as soon as it is observed: further runs
+    would not change the answer whether the state is reachable. If `explorer`
+    is provided, then stops when all the schedules are explored, or as soon as
+    some run does not complete.
     """
     yield  # first run
     while True:
+        if explorer is not None and not isinstance(stats.last, SimOk):
+            # The explorer takes the first runnable thread on every new step,
+            # so a spin loop starves the other threads till the timeout. The
+            # state of such run is inconsistent (e.g. pending stores), and the
+            # rest of the schedules could not be explored anyway.
+            print(f"exhaustive exploration stopped, run result: {stats.last}")
+            print("(the demo is not loop-free)")
+            return
+
         snap = collector()
         outputs.add(snap)
         tso.reinit()  # explicit reinit
@@ -301,6 +487,12 @@ def reg_count_looper(
         if iters and stats.total >= iters:
             return
 
+        if snap == until:
+            return
+
+        if explorer is not None and not explorer.advance():
+            return
+
         yield  # next run
 
 
@@ -312,6 +504,9 @@ Target: TypeAlias = tuple[NamedSnapshot, bool]
 class Demo(Protocol):
     """Template for x86-TSO examples."""
 
+    # whether all the schedules fit into the exploration budget
+    explorable: ClassVar[bool]
+
     @staticmethod
     def configure() -> Config:
         """Run the demo and collect observed states."""
@@ -342,23 +537,25 @@ class SbDemo:
     - both storebuffers flush
     """
 
+    explorable = True
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=2)
         p0, p1 = tso.procs
 
         def t0(p: Processor) -> SimThread:
-            yield from p.mov(Addr("x"), 1)
-            yield from p.mov(Reg("eax"), Addr("y"))
+            yield from p.mov(X, 1)
+            yield from p.mov(EAX, Y)
 
         def t1(p: Processor) -> SimThread:
-            yield from p.mov(Addr("y"), 1)
-            yield from p.mov(Reg("ebx"), Addr("x"))
+            yield from p.mov(Y, 1)
+            yield from p.mov(EBX, X)
 
         def snapshot() -> Snapshot:
             return (
-                p0.regs[Reg("eax")],
-                p1.regs[Reg("ebx")],
+                p0.regs[EAX],
+                p1.regs[EBX],
             )
 
         return tso, [t0, t1], snapshot
@@ -381,31 +578,33 @@ class IriwDemo:
     Forbidden Final State: P2:EAX=1 and P2:EBX=0 and P3:ECX=1 and P3:EDX=0.
     """
 
+    explorable = False  # too many schedules
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=4)
         _, _, p2, p3 = tso.procs
 
         def t0(p: Processor) -> SimThread:
-            yield from p.mov(Addr("x"), 1)
+            yield from p.mov(X, 1)
 
         def t1(p: Processor) -> SimThread:
-            yield from p.mov(Addr("y"), 1)
+            yield from p.mov(Y, 1)
 
         def t2(p: Processor) -> SimThread:
-            yield from p.mov(Reg("eax"), Addr("x"))
-            yield from p.mov(Reg("ebx"), Addr("y"))
+            yield from p.mov(EAX, X)
+            yield from p.mov(EBX, Y)
 
         def t3(p: Processor) -> SimThread:
-            yield from p.mov(Reg("ecx"), Addr("y"))
-            yield from p.mov(Reg("edx"), Addr("x"))
+            yield from p.mov(ECX, Y)
+            yield from p.mov(EDX, X)
 
         def snapshot() -> Snapshot:
             return (
-                p2.regs[Reg("eax")],
-                p2.regs[Reg("ebx")],
-                p3.regs[Reg("ecx")],
-                p3.regs[Reg("edx")],
+                p2.regs[EAX],
+                p2.regs[EBX],
+                p3.regs[ECX],
+                p3.regs[EDX],
             )
 
         return tso, [t0, t1, t2, t3], snapshot
@@ -436,25 +635,27 @@ class N6Demo:
     - P0 finally flushes his store buffer, [x] = 1
     """
 
+    explorable = False  # too many schedules
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=2)
         p0, _ = tso.procs
 
         def t0(p: Processor) -> SimThread:
-            yield from p.mov(Addr("x"), 1)
-            yield from p.mov(Reg("eax"), Addr("x"))
-            yield from p.mov(Reg("ebx"), Addr("y"))
+            yield from p.mov(X, 1)
+            yield from p.mov(EAX, X)
+            yield from p.mov(EBX, Y)
 
         def t1(p: Processor) -> SimThread:
-            yield from p.mov(Addr("y"), 2)
-            yield from p.mov(Addr("x"), 2)
+            yield from p.mov(Y, 2)
+            yield from p.mov(X, 2)
 
         def snapshot() -> Snapshot:
             return (
-                p0.regs[Reg("eax")],
-                p0.regs[Reg("ebx")],
-                tso.mem[Addr("x")],
+                p0.regs[EAX],
+                p0.regs[EBX],
+                tso.mem.get(X, 0),
             )
 
         return tso, [t0, t1], snapshot
@@ -476,23 +677,25 @@ class N5Demo:
     Forbidden Final State: P0:EAX=2 and P1:EBX=1
     """
 
+    explorable = True
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=2)
         p0, p1 = tso.procs
 
         def t0(p: Processor) -> SimThread:
-            yield from p.mov(Addr("x"), 1)
-            yield from p.mov(Reg("eax"), Addr("x"))
+            yield from p.mov(X, 1)
+            yield from p.mov(EAX, X)
 
         def t1(p: Processor) -> SimThread:
-            yield from p.mov(Addr("x"), 2)
-            yield from p.mov(Reg("ebx"), Addr("x"))
+            yield from p.mov(X, 2)
+            yield from p.mov(EBX, X)
 
         def snapshot() -> Snapshot:
             return (
-                p0.regs[Reg("eax")],
-                p1.regs[Reg("ebx")],
+                p0.regs[EAX],
+                p1.regs[EBX],
             )
 
         return tso, [t0, t1], snapshot
@@ -514,23 +717,25 @@ class N4bDemo:
     Forbidden Final State: P0:EAX=2 and P1:ECX=1
     """
 
+    explorable = True
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=2)
         p0, p1 = tso.procs
 
         def t0(p: Processor) -> SimThread:
-            yield from p.mov(Reg("eax"), Addr("x"))
-            yield from p.mov(Addr("x"), 1)
+            yield from p.mov(EAX, X)
+            yield from p.mov(X, 1)
 
         def t1(p: Processor) -> SimThread:
-            yield from p.mov(Reg("ecx"), Addr("x"))
-            yield from p.mov(Addr("x"), 2)
+            yield from p.mov(ECX, X)
+            yield from p.mov(X, 2)
 
         def snapshot() -> Snapshot:
             return (
-                p0.regs[Reg("eax")],
-                p1.regs[Reg("ecx")],
+                p0.regs[EAX],
+                p1.regs[ECX],
             )
 
         return tso, [t0, t1], snapshot
@@ -554,23 +759,25 @@ class Ex_8_1_Demo:
     Forbidden Final State: P1:EAX=1 and P1:EBX=0.
     """
 
+    explorable = True
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=2)
         _, p1 = tso.procs
 
         def t0(p: Processor) -> SimThread:
-            yield from p.mov(Addr("x"), 1)
-            yield from p.mov(Addr("y"), 1)
+            yield from p.mov(X, 1)
+            yield from p.mov(Y, 1)
 
         def t1(p: Processor) -> SimThread:
-            yield from p.mov(Reg("eax"), Addr("y"))
-            yield from p.mov(Reg("ebx"), Addr("x"))
+            yield from p.mov(EAX, Y)
+            yield from p.mov(EBX, X)
 
         def snapshot() -> Snapshot:
             return (
-                p1.regs[Reg("eax")],
-                p1.regs[Reg("ebx")],
+                p1.regs[EAX],
+                p1.regs[EBX],
             )
 
         return tso, [t0, t1], snapshot
@@ -594,23 +801,25 @@ class Ex_8_2_Demo:
     Forbidden Final State: P0:EAX=1 and P1:EBX=1
     """
 
+    explorable = True
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=2)
         p0, p1 = tso.procs
 
         def t0(p: Processor) -> SimThread:
-            yield from p.mov(Reg("eax"), Addr("x"))
-            yield from p.mov(Addr("y"), 1)
+            yield from p.mov(EAX, X)
+            yield from p.mov(Y, 1)
 
         def t1(p: Processor) -> SimThread:
-            yield from p.mov(Reg("ebx"), Addr("y"))
-            yield from p.mov(Addr("x"), 1)
+            yield from p.mov(EBX, Y)
+            yield from p.mov(X, 1)
 
         def snapshot() -> Snapshot:
             return (
-                p0.regs[Reg("eax")],
-                p1.regs[Reg("ebx")],
+                p0.regs[EAX],
+                p1.regs[EBX],
             )
 
         return tso, [t0, t1], snapshot
@@ -634,17 +843,19 @@ class Ex_8_4_Demo:
     Required Final State: P0:EAX=1
     """
 
+    explorable = True
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=1)
         [p0] = tso.procs
 
         def t0(p: Processor) -> SimThread:
-            yield from p.mov(Addr("x"), 1)
-            yield from p.mov(Reg("eax"), Addr("x"))
+            yield from p.mov(X, 1)
+            yield from p.mov(EAX, X)
 
         def snapshot() -> Snapshot:
-            return (p0.regs[Reg("eax")],)
+            return (p0.regs[EAX],)
 
         return tso, [t0], snapshot
 
@@ -667,27 +878,29 @@ class Ex_8_6_Demo:
     Forbidden Final State: P1:EAX=1 and P2:EBX=1 and P2:ECX=0
     """
 
+    explorable = False  # too many schedules
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=3)
         _, p1, p2 = tso.procs
 
         def t0(p: Processor) -> SimThread:
-            yield from p.mov(Addr("x"), 1)
+            yield from p.mov(X, 1)
 
         def t1(p: Processor) -> SimThread:
-            yield from p.mov(Reg("eax"), Addr("x"))
-            yield from p.mov(Addr("y"), 1)
+            yield from p.mov(EAX, X)
+            yield from p.mov(Y, 1)
 
         def t2(p: Processor) -> SimThread:
-            yield from p.mov(Reg("ebx"), Addr("y"))
-            yield from p.mov(Reg("ecx"), Addr("x"))
+            yield from p.mov(EBX, Y)
+            yield from p.mov(ECX, X)
 
         def snapshot() -> Snapshot:
             return (
-                p1.regs[Reg("eax")],
-                p2.regs[Reg("ebx")],
-                p2.regs[Reg("ecx")],
+                p1.regs[EAX],
+                p2.regs[EBX],
+                p2.regs[ECX],
             )
 
         return tso, [t0, t1, t2], snapshot
@@ -712,25 +925,27 @@ class Ex_8_9_Demo:
     Forbidden Final State: P0:EBX=0 and P1:EDX=0
     """
 
+    explorable = True
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=2)
         p0, p1 = tso.procs
 
         def t0(p: Processor) -> SimThread:
-            p.regs[Reg("eax")] = 1  # initialize
-            yield from p.xchg(Addr("x"), Reg("eax"))
-            yield from p.mov(Reg("ebx"), Addr("y"))
+            p.regs[EAX] = 1  # initialize
+            yield from p.xchg(X, EAX)
+            yield from p.mov(EBX, Y)
 
         def t1(p: Processor) -> SimThread:
-            p.regs[Reg("ecx")] = 1  # initialize
-            yield from p.xchg(Addr("y"), Reg("ecx"))
-            yield from p.mov(Reg("edx"), Addr("x"))
+            p.regs[ECX] = 1  # initialize
+            yield from p.xchg(Y, ECX)
+            yield from p.mov(EDX, X)
 
         def snapshot() -> Snapshot:
             return (
-                p0.regs[Reg("ebx")],
-                p1.regs[Reg("edx")],
+                p0.regs[EBX],
+                p1.regs[EDX],
             )
 
         return tso, [t0, t1], snapshot
@@ -755,24 +970,26 @@ class Ex_8_10_Demo:
     Forbidden Final State: P1:EBX=1 and P1:ECX=0
     """
 
+    explorable = True
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=2)
         _, p1 = tso.procs
 
         def t0(p: Processor) -> SimThread:
-            p.regs[Reg("eax")] = 1  # initialize
-            yield from p.xchg(Addr("x"), Reg("eax"))
-            yield from p.mov(Addr("y"), 1)
+            p.regs[EAX] = 1  # initialize
+            yield from p.xchg(X, EAX)
+            yield from p.mov(Y, 1)
 
         def t1(p: Processor) -> SimThread:
-            yield from p.mov(Reg("ebx"), Addr("y"))
-            yield from p.mov(Reg("ecx"), Addr("x"))
+            yield from p.mov(EBX, Y)
+            yield from p.mov(ECX, X)
 
         def snapshot() -> Snapshot:
             return (
-                p1.regs[Reg("ebx")],
-                p1.regs[Reg("ecx")],
+                p1.regs[EBX],
+                p1.regs[ECX],
             )
 
         return tso, [t0, t1], snapshot
@@ -795,25 +1012,27 @@ class Amd5Demo:
     Forbidden Final State: P0:EAX=0 and P1:EBX=0.
     """
 
+    explorable = True
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=2)
         p0, p1 = tso.procs
 
         def t0(p: Processor) -> SimThread:
-            yield from p.mov(Addr("x"), 1)
+            yield from p.mov(X, 1)
             yield from p.mfence()
-            yield from p.mov(Reg("eax"), Addr("y"))
+            yield from p.mov(EAX, Y)
 
         def t1(p: Processor) -> SimThread:
-            yield from p.mov(Addr("y"), 1)
+            yield from p.mov(Y, 1)
             yield from p.mfence()
-            yield from p.mov(Reg("ebx"), Addr("x"))
+            yield from p.mov(EBX, X)
 
         def snapshot() -> Snapshot:
             return (
-                p0.regs[Reg("eax")],
-                p1.regs[Reg("ebx")],
+                p0.regs[EAX],
+                p1.regs[EBX],
             )
 
         return tso, [t0, t1], snapshot
@@ -841,8 +1060,8 @@ class LinuxSpinlock:
 
             # spin loop
             while True:
-                yield from p.mov(Reg("ebx"), self.addr)
-                if p.regs[Reg("ebx")] > 0:
+                yield from p.mov(EBX, self.addr)
+                if p.regs[EBX] > 0:
                     # looks released, try to acquire again
                     break
 
@@ -866,19 +1085,22 @@ class LinuxSpinlockDemo:
     release: MOV [EAX] <- 1
     """
 
+    explorable = False  # spin loops
+
     @staticmethod
     def configure() -> Config:
         spinaddr = Addr("spinlock")  # use global address for spinlock
         tso = TSO(nr_threads=2, defmem={spinaddr: 1})
         spin = LinuxSpinlock(spinaddr)
+        counter = Addr("counter")
 
         def t(p: Processor) -> SimThread:
             yield from spin.lock(p)
-            yield from p.inc(Addr("counter"))
+            yield from p.inc(counter)
             yield from spin.unlock(p)
 
         def snapshot() -> Snapshot:
-            return (tso.mem[Addr("counter")],)
+            return (tso.mem.get(counter, 0),)
 
         return tso, [t, t], snapshot
 
@@ -895,13 +1117,13 @@ class LinuxTicketedSpinlock:
     hiaddr: Addr
 
     def lock(self, p: Processor) -> SimThread:
-        yield from p.mov(Reg("ecx"), 1)
-        yield from p.lock_xadd(self.loaddr, Reg("ecx"))
+        yield from p.mov(ECX, 1)
+        yield from p.lock_xadd(self.loaddr, ECX)
 
         # spin loop
         while True:
-            yield from p.mov(Reg("eax"), self.hiaddr)
-            if p.regs[Reg("eax")] == p.regs[Reg("ecx")]:
+            yield from p.mov(EAX, self.hiaddr)
+            if p.regs[EAX] == p.regs[ECX]:
                 # now it is our ticket, released
                 return
 
@@ -924,18 +1146,21 @@ class LinuxTicketedSpinlockDemo:
     release:                        ; [x] := [x] + 1
     """
 
+    explorable = False  # spin loops
+
     @staticmethod
     def configure() -> Config:
         spin = LinuxTicketedSpinlock(Addr("spinlo"), Addr("spinhi"))
+        counter = Addr("counter")
         tso = TSO(nr_threads=2)
 
         def t(p: Processor) -> SimThread:
             yield from spin.lock(p)
-            yield from p.inc(Addr("counter"))
+            yield from p.inc(counter)
             yield from spin.unlock(p)
 
         def snapshot() -> Snapshot:
-            return (tso.mem[Addr("counter")],)
+            return (tso.mem.get(counter, 0),)
 
         return tso, [t, t], snapshot
 
@@ -944,6 +1169,10 @@ class LinuxTicketedSpinlockDemo:
         return (("counter", 1),), False
 
 
+# registers used by the Parker methods
+PARK_COUNTER, UNPARK_COUNTER = Reg("counter"), Reg("unparkcounter")
+
+
 @dataclass
 class JVMParker:
     """Skeleton of Parker class from JVM."""
@@ -983,15 +1212,15 @@ class JVMParker:
     def _pthread_cond_signal(self, p: Processor) -> SimThread:
         yield from schedule()
         # emulate signal send as instant write to some addr
-        if p.mem[self.cond] == 1:
+        if p.mem.get(self.cond, 0) == 1:
             # if ready, deliver the signal, lost otherwise
             p.mem[self.cond] = 2
 
         yield from schedule()
 
     def park(self, p: Processor, *, bugged: bool) -> SimThread:
-        yield from p.mov(Reg("counter"), self.counter)
-        if p.regs[Reg("counter")] > 0:
+        yield from p.mov(PARK_COUNTER, self.counter)
+        if p.regs[PARK_COUNTER] > 0:
             # fastpath
             yield from p.mov(self.counter, 0)
             if not bugged:
@@ -1005,8 +1234,8 @@ class JVMParker:
         if not succ.val:
             return
 
-        yield from p.mov(Reg("counter"), self.counter)
-        if p.regs[Reg("counter")] > 0:
+        yield from p.mov(PARK_COUNTER, self.counter)
+        if p.regs[PARK_COUNTER] > 0:
             # no wait needed
             yield from p.mov(self.counter, 0)
             yield from self._pthread_mutex_unlock(p)
@@ -1018,10 +1247,10 @@ class JVMParker:
 
     def unpark(self, p: Processor) -> SimThread:
         yield from self._pthread_mutex_lock()
-        yield from p.mov(Reg("unparkcounter"), self.counter)
+        yield from p.mov(UNPARK_COUNTER, self.counter)
         yield from p.mov(self.counter, 1)
         yield from self._pthread_mutex_unlock(p)
-        if p.regs[Reg("unparkcounter")] < 1:
+        if p.regs[UNPARK_COUNTER] < 1:
             yield from self._pthread_cond_signal(p)
 
 
@@ -1036,35 +1265,39 @@ class JVMParkerBugDemo:
     Parker::unpark signal and thread hangup.
     """
 
+    explorable = False  # spin loops
+
     @staticmethod
     def configure(bugged: bool = True) -> Config:
         tso = TSO(nr_threads=2)
         pk = JVMParker(Addr("counter"), Mutex(), Addr("condvar"))
+        sh1 = Addr("sh1")
+        wakeup = Reg("wakeup")
 
         def waiter(p: Processor):
             # init local var
-            p.regs[Reg("wakeup")] = 0
+            p.regs[wakeup] = 0
 
             while True:
-                yield from p.mov(Reg("eax"), Addr("sh1"))
-                if p.regs[Reg("eax")] == 1:
+                yield from p.mov(EAX, sh1)
+                if p.regs[EAX] == 1:
                     break
 
                 yield from pk.park(p, bugged=bugged)
 
-            p.regs[Reg("wakeup")] = 1  # may lose signal and not get here
+            p.regs[wakeup] = 1  # may lose signal and not get here
 
         def provider(p: Processor):
             # prepare the initial state, internal counter should be 1
             yield from pk.unpark(p)
 
             # reproduce lost wakeup
-            yield from p.mov(Addr("sh1"), 1)
+            yield from p.mov(sh1, 1)
             yield from p.mfence()
             yield from pk.unpark(p)
 
         def snapshot() -> Snapshot:
-            return (tso.procs[0].regs[Reg("wakeup")],)
+            return (tso.procs[0].regs[wakeup],)
 
         return tso, [waiter, provider], snapshot
 
@@ -1083,6 +1316,8 @@ class JVMParkerBugFixedDemo:
     suffer from lost signals as the original one.
     """
 
+    explorable = False  # spin loops
+
     @staticmethod
     def configure() -> Config:
         return JVMParkerBugDemo.configure(bugged=False)
@@ -1102,15 +1337,17 @@ class PetersonMutex:
     def lock(tid: int, p: Processor, use_mb: bool) -> SimThread:
         me = tid
         other = 1 - tid
-        yield from p.mov(Addr(f"f{me}"), 1)
-        yield from p.mov(Addr("turn"), other)
+        myflag, otherflag = Addr(f"f{me}"), Addr(f"f{other}")
+        turn = Addr("turn")
+        yield from p.mov(myflag, 1)
+        yield from p.mov(turn, other)
         if use_mb:
             yield from p.mfence()
 
         while True:
-            yield from p.mov(Reg("eax"), Addr(f"f{other}"))
-            yield from p.mov(Reg("ebx"), Addr("turn"))
-            if not (p.regs[Reg("eax")] and p.regs[Reg("ebx")] == other):
+            yield from p.mov(EAX, otherflag)
+            yield from p.mov(EBX, turn)
+            if not (p.regs[EAX] and p.regs[EBX] == other):
                 return
 
     @staticmethod
@@ -1154,22 +1391,25 @@ class PetersonLockDemo:
     - both threads are in critical section, data race over [counter]
     """
 
+    explorable = False  # spin loops
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=2)
+        counter = Addr("counter")
 
         def t0(p: Processor) -> SimThread:
             yield from PetersonMutex.lock(0, p, use_mb=False)
-            yield from p.inc(Addr("counter"))
+            yield from p.inc(counter)
             yield from PetersonMutex.unlock(0, p)
 
         def t1(p: Processor) -> SimThread:
             yield from PetersonMutex.lock(1, p, use_mb=False)
-            yield from p.inc(Addr("counter"))
+            yield from p.inc(counter)
             yield from PetersonMutex.unlock(1, p)
 
         def snapshot() -> Snapshot:
-            return (tso.mem[Addr("counter")],)
+            return (tso.mem.get(counter, 0),)
 
         return tso, [t0, t1], snapshot
 
@@ -1207,22 +1447,25 @@ class PetersonLockFixedDemo:
     Forbidden Final State: [counter]=1.
     """
 
+    explorable = False  # spin loops
+
     @staticmethod
     def configure() -> Config:
         tso = TSO(nr_threads=2)
+        counter = Addr("counter")
 
         def t0(p: Processor) -> SimThread:
             yield from PetersonMutex.lock(0, p, use_mb=True)
-            yield from p.inc(Addr("counter"))
+            yield from p.inc(counter)
             yield from PetersonMutex.unlock(0, p)
 
         def t1(p: Processor) -> SimThread:
             yield from PetersonMutex.lock(1, p, use_mb=True)
-            yield from p.inc(Addr("counter"))
+            yield from p.inc(counter)
             yield from PetersonMutex.unlock(1, p)
 
         def snapshot() -> Snapshot:
-            return (tso.mem[Addr("counter")],)
+            return (tso.mem.get(counter, 0),)
 
         return tso, [t0, t1], snapshot
 
@@ -1232,10 +1475,32 @@ class PetersonLockFixedDemo:
         return (("[counter]", 1),), False
 
 
-def play_demo(demo: type[Demo], *, iters: int = 0) -> bool:
-    """Play the demo from the template."""
+# limit of schedules for the exhaustive exploration (about a minute to run),
+# the demos with more schedules are not `explorable`
+EXPLORATION_BUDGET = 1_000_000
+
+
+def play_demo(
+    demo: type[Demo],
+    *,
+    iters: int = 0,
+    early_stop: bool = False,
+    exhaustive: bool = False,
+) -> bool:
+    """Play the demo from the template.
+
+    With `early_stop` the simulation stops once the target state is observed.
+    With `exhaustive` all the possible schedules are explored systematically
+    instead of random sampling, which is feasible only for `explorable` demos:
+    there is no reduction of equivalent schedules, so the exploration fails
+    when EXPLORATION_BUDGET is exceeded. It also gives up on the first run
+    which does not complete, and then the demo fails. The counts make no sense
+    for the exploration, so only the reachable states are reported.
+    """
     # prepare the demo
     tso, thrctrs, snapshot = demo.configure()
+    target, allowed = demo.target()
+    target_snap = tuple(snap for _, snap in target)
 
     assert len(tso.procs) == len(thrctrs), "must be exact amount of threads"
 
@@ -1244,27 +1509,54 @@ def play_demo(demo: type[Demo], *, iters: int = 0) -> bool:
 
     # run the demo and collect the observed states
     outputs = ObservedStats()
+    explorer = ScheduleExplorer(EXPLORATION_BUDGET) if exhaustive else None
+
+    # the constructors are called on every run, so prepare plain closures once
+    def wrapped(p: Processor, t: Prog) -> SimThreadConstructor:
+        def ctr() -> SimThread:
+            return p.wrap(t)
+
+        return ctr
+
+    ctrs = (
+        *(wrapped(p, t) for p, t in zip(tso.procs, thrctrs)),
+        *tso.sbctrs,
+    )
     simsched(
-        itertools.chain(
-            [partial(p.wrap, t) for p, t in zip(tso.procs, thrctrs)],
-            tso.sbctrs,
+        ctrs,
+        loopctr=partial(
+            reg_count_looper,
+            outputs,
+            snapshot,
+            tso,
+            iters,
+            target_snap if early_stop else None,
+            explorer,
         ),
-        loopctr=partial(reg_count_looper, outputs, snapshot, tso, iters),
+        chooser=explorer,
     )
 
     print("interrupted\n")
+    outputs.flush()
     print(f"Observed states (total {len(outputs.storage)}):")
 
     # pretty print the outputs
-    target, allowed = demo.target()
     target_name = [name for name, _ in target]
-    target_snap = tuple(snap for _, snap in target)
-    print(outputs.describe(target_name))
+    print(outputs.describe(target_name, counts=explorer is None))
 
     # investigate the target snapshot
     status = "Allowed" if allowed else "Forbidden"
     count = outputs.storage.get(target_snap, 0)
-    print(f"{status} state: {target} happened {count} times")
+    if explorer is None:
+        print(f"{status} state: {target} happened {count} times")
+        return allowed == bool(count)
+
+    reachable = "reachable" if count else "unreachable"
+    print(f"{status} state: {target} is {reachable}")
+    print(f"explored schedules: {explorer.schedules}")
+    if not explorer.done:
+        print("the exploration is incomplete, no answer")
+        return False
 
     return allowed == bool(count)
 
@@ -1299,7 +1591,7 @@ def test() -> bool:
         io = StringIO()
         print(name, end=": ")
         with contextlib.redirect_stdout(io):
-            result = play_demo(demo, iters=10000)
+            result = play_demo(demo, iters=10000, early_stop=True)
 
         if result:
             print("OK")
@@ -1321,17 +1613,23 @@ def main() -> None:
     prog, *args = sys.argv
 
     def usage() -> None:
-        print(f"usage: {prog} {demos_list()}")
+        print(f"usage: {prog} [--test | [--exhaustive] DEMO]")
+        print(f"DEMO is one of {demos_list()}")
 
     match args:
         case ["--test"]:
             success = test()
-        case [name]:
+        case [name] | ["--exhaustive", name]:
             if name not in DEMOS:
                 usage()
                 sys.exit(1)
 
-            success = play_demo(DEMOS[name])
+            exhaustive = args[0] == "--exhaustive"
+            if exhaustive and not DEMOS[name].explorable:
+                print(f"{name} cannot be explored within the budget")
+                sys.exit(1)
+
+            success = play_demo(DEMOS[name], exhaustive=exhaustive)
         case _:
             usage()
             sys.exit(1)
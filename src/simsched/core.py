@@ -69,12 +69,19 @@ def cond_schedule(is_runnable: Predicate) -> SimThread:
                 break
 
 
+def _always_runnable() -> bool:
+    """Wakeup condition for unconditional scheduling."""
+    return True
+
+
 def schedule() -> SimThread:
     """Simply yield the current thread execution to the engine.
 
-    Useful for simulating interleaving code paths.
+    Useful for simulating interleaving code paths. It is not a generator
+    itself, but returns the `cond_schedule` one directly, so there is no
+    extra generator frame to pass through on every engine command.
     """
-    yield from cond_schedule(lambda: True)
+    return cond_schedule(_always_runnable)
 
 
 def finish() -> SimThread:
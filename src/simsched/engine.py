@@ -25,6 +25,9 @@ from .core import SchedulerMessage, SimThread, ThreadState, finish, schedule
 
 SimThreadConstructor: TypeAlias = Callable[[], SimThread]
 
+# picks the index of the thread to advance from the given number of runnables
+Chooser: TypeAlias = Callable[[int], int]
+
 
 def poll(threads: list[SimThread]) -> tuple[list[SimThread], list[SimThread]]:
     """Poll active threads.
@@ -34,19 +37,21 @@ def poll(threads: list[SimThread]) -> tuple[list[SimThread], list[SimThread]]:
     threads, and the second one is all the unfinished threads.
     """
     ready = []
-    total = []
+    finished = []
 
     for thrd in threads:
         match thrd.send(SchedulerMessage.POLL):
-            case ThreadState.FINAL:
-                # stop accounting threads which reported it is finished
-                continue
             case ThreadState.READY:
                 ready.append(thrd)
+            case ThreadState.FINAL:
+                finished.append(thrd)
 
-        total.append(thrd)
+    if finished:
+        # Stop accounting threads which reported it is finished. It happens
+        # once per thread, so the list of threads is not rebuilt on every poll.
+        threads = [thrd for thrd in threads if thrd not in finished]
 
-    return ready, total
+    return ready, threads
 
 
 def spawn_coroutines(ts: Iterable[SimThreadConstructor]) -> list[SimThread]:
@@ -103,6 +108,7 @@ SimResult: TypeAlias = SimOk | SimDeadlock | SimTimeout | SimPanic
 def run(
     coros: Iterable[SimThreadConstructor],
     max_steps: int = 1000,
+    chooser: Chooser | None = None,
 ) -> SimResult:
     """Run the engine till we get some result.
 
@@ -113,22 +119,29 @@ def run(
     * on some step only blocked threads remain - DEADLOCK
     * step limit exceeded - TIMEOUT
     * some thread raised an exception - PANIC
+
+    The thread to advance is picked randomly, unless the `chooser` is provided.
+    The runnable threads are always passed to it in the order of coroutines.
     """
     threads = spawn_coroutines(coros)
 
     # account the fact we need one additional pseudostep to start a thread
     for _ in range(max_steps + len(threads)):
-        runnables, available = poll(threads)
+        # finished threads are dropped, so they are not polled anymore
+        runnables, threads = poll(threads)
         if not runnables:
-            if not available:
+            if not threads:
                 # no runnables and all finished - OK
                 return SimOk()
             else:
                 # no runnables but some are not finished - DEADLOCK
                 return SimDeadlock()
 
-        # pick up the random thread to advance
-        thrd = random.choice(runnables)
+        # pick up the thread to advance
+        if chooser is None:
+            thrd = random.choice(runnables)
+        else:
+            thrd = runnables[chooser(len(runnables))]
         try:
             # Catch exceptions only when advancing threads with user-provided
             # code. It is the only place where it is permitted to happen - i.e.
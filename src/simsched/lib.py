@@ -14,7 +14,11 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <https://www.gnu.org/licenses/>.
 
-"""Collection of scheduling/synchronization primitives."""
+"""Collection of scheduling/synchronization primitives.
+
+All the primitives are slotted dataclasses, as their state is accessed by
+wakeup predicates on every engine poll.
+"""
 
 import collections
 from dataclasses import dataclass
@@ -25,14 +29,14 @@ from simsched.core import SimThread, cond_schedule, schedule
 Item = TypeVar("Item")
 
 
-@dataclass
+@dataclass(slots=True)
 class Cell(Generic[Item]):
     """Mutable container for any type."""
 
     val: Item
 
 
-@dataclass
+@dataclass(slots=True)
 class Mutex:
     """Simple mutual exclusion primitive."""
 
@@ -59,7 +63,7 @@ class Mutex:
         yield from schedule()
 
 
-@dataclass
+@dataclass(slots=True)
 class TxChannel:
     """Generic one-way TX channel for passing objects of any type."""
 
@@ -71,7 +75,7 @@ class TxChannel:
         yield from schedule()
 
 
-@dataclass
+@dataclass(slots=True)
 class RxChannel:
     """Generic one-way RX channel for receiving objects of any type."""
 
@@ -18,12 +18,15 @@
 
 import contextlib
 import itertools
+import multiprocessing
+import signal
 import time
 from collections.abc import Callable, Iterable, Iterator
 from dataclasses import dataclass
-from typing import TypeAlias
+from typing import TypeAlias, TypeVar
 
 from simsched.engine import (
+    Chooser,
     SimDeadlock,
     SimOk,
     SimPanic,
@@ -45,6 +48,19 @@ class RunStats:
     panic: int = 0
     last: SimResult | None = None
 
+    def merge(self, other: "RunStats") -> None:
+        """Accumulate stats of another simulation.
+
+        Useful for combining the results of independent simulations, i.e. run
+        in separate processes. The last result is taken from `other`.
+        """
+        self.total += other.total
+        self.ok += other.ok
+        self.deadlock += other.deadlock
+        self.timeout += other.timeout
+        self.panic += other.panic
+        self.last = other.last
+
 
 LoopController: TypeAlias = Iterator[None]
 LoopControllerConstructor: TypeAlias = Callable[[RunStats], LoopController]
@@ -53,6 +69,7 @@ LoopControllerConstructor: TypeAlias = Callable[[RunStats], LoopController]
 def simsched(
     icoros: Iterable[SimThreadConstructor],
     loopctr: LoopControllerConstructor,
+    chooser: Chooser | None = None,
 ) -> RunStats:
     """Start simulated scheduling.
 
@@ -60,6 +77,9 @@ def simsched(
     The loop is controlled by LoopController iterator object which is called
     before each run. This object could the loop based on its own decision about
     execution stats; it could also clear the environment for the threads.
+
+    The optional `chooser` is passed to the engine to pick threads instead of
+    random scheduling, see `ScheduleExplorer`.
     """
     # create a stats object to collect data and communicate with the controller
     stats = RunStats()
@@ -70,7 +90,7 @@ def simsched(
     # run until loopctr returns or CTRL+C
     with contextlib.suppress(KeyboardInterrupt):
         for _ in loopctr(stats):
-            result = run(coros)
+            result = run(coros, chooser=chooser)
             match result:
                 case SimOk():
                     stats.ok += 1
@@ -87,6 +107,117 @@ def simsched(
     return stats
 
 
+T = TypeVar("T")
+
+# simulation task for a worker process, takes the number of runs to simulate
+SimTask: TypeAlias = Callable[[int], tuple[RunStats, T]]
+
+
+def _init_worker() -> None:
+    """Prepare the worker process for simulation."""
+    # the main process handles Ctrl+C and terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def simsched_parallel(
+    task: SimTask[T],
+    collect: Callable[[T, RunStats], None],
+    *,
+    jobs: int,
+    runs_per_task: int = 5000,
+    rounds: int | None = None,
+) -> RunStats:
+    """Start independent simulations in worker processes.
+
+    The `task` is called in a worker with the number of runs to simulate, and
+    must return its run stats and the result. It must be picklable, i.e. a
+    module-level function or a `functools.partial` of it. Tasks are submitted
+    in rounds of `jobs` tasks until Ctrl+C or until the number of `rounds` is
+    done. Each result is passed to `collect` in the main process together with
+    the total stats accumulated so far, so `runs_per_task` also sets how often
+    the progress could be reported.
+    """
+    stats = RunStats()
+
+    with multiprocessing.Pool(jobs, initializer=_init_worker) as pool:
+        tasks = [runs_per_task] * jobs
+        iterations = itertools.count() if rounds is None else range(rounds)
+        with contextlib.suppress(KeyboardInterrupt):
+            for _ in iterations:
+                for wstats, result in pool.imap_unordered(task, tasks):
+                    stats.merge(wstats)
+                    collect(result, stats)
+
+    return stats
+
+
+class ScheduleExplorer:
+    """Systematic depth-first exploration of all the possible schedules.
+
+    Use it as the engine `chooser` instead of random scheduling. Each run
+    replays the choices of the previous one up to the last branching point
+    which still has unexplored alternatives, takes the next alternative there,
+    and then always picks the first runnable thread. The loop controller must
+    call `advance` after each run and stop when it returns False, then `done`
+    is set.
+
+    The threads must be deterministic for the given schedule, i.e. the
+    environment must be reset between runs. The number of schedules grows
+    exponentially with the number of steps and no reduction is done, so this
+    is useful only for small programs without unbounded loops. Pass the
+    `max_schedules` budget to fail instead of running for ages.
+    """
+
+    def __init__(self, max_schedules: int | None = None) -> None:
+        """Class constructor."""
+        # taken choice and the number of alternatives for each step
+        self.path: list[tuple[int, int]] = []
+        self.depth = 0
+        self.max_schedules = max_schedules
+        self.schedules = 1  # the first schedule needs no preparation
+        self.done = False
+
+    def __call__(self, nr_runnables: int) -> int:
+        """Choose the thread for the current step."""
+        if self.depth < len(self.path):
+            choice, total = self.path[self.depth]
+            if total != nr_runnables:
+                raise RuntimeError("threads must be deterministic")
+        else:
+            choice = 0
+            self.path.append((choice, nr_runnables))
+
+        self.depth += 1
+        return choice
+
+    def advance(self) -> bool:
+        """Prepare the next schedule, return False when all are explored.
+
+        If the budget of schedules is exceeded, the exception is raised.
+        """
+        # the steps beyond the current run depth were not taken this time
+        del self.path[self.depth :]
+        self.depth = 0
+
+        while self.path:
+            choice, total = self.path.pop()
+            if choice + 1 < total:
+                self.path.append((choice + 1, total))
+                break
+        else:
+            self.done = True
+            return False
+
+        self.schedules += 1
+        if self.max_schedules is not None:
+            if self.schedules > self.max_schedules:
+                raise RuntimeError(
+                    f"more than {self.max_schedules} schedules to explore"
+                )
+
+        return True
+
+
 # some collection of pre-defined loopers
 
 
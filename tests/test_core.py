@@ -16,7 +16,14 @@
 
 from functools import partial
 
-from simsched.core import SimThread, cond_schedule, finish, schedule
+from simsched.core import (
+    SchedulerMessage,
+    SimThread,
+    ThreadState,
+    cond_schedule,
+    finish,
+    schedule,
+)
 from simsched.engine import SimDeadlock, SimOk, SimPanic, SimTimeout, run
 
 
@@ -134,3 +141,26 @@ def test_simple_exception():
     assert isinstance(res, SimPanic), "result type must be PANIC"
     assert isinstance(res.e, RuntimeError), "must provide the exception object"
     assert res.e.args == ("testmsg",), "must provide the exception object"
+
+
+def test_finished_not_polled():
+    """Engine must not poll the thread again once it reported it is final."""
+    polls_after_final = 0
+
+    def short() -> SimThread:
+        """Like `finish`, but count the polls after the final state."""
+        nonlocal polls_after_final
+        cmd = yield ThreadState.YIELD
+        assert cmd == SchedulerMessage.POLL, cmd
+        cmd = yield ThreadState.FINAL
+        while True:
+            polls_after_final += 1
+            cmd = yield ThreadState.FINAL
+
+    def long() -> SimThread:
+        """Keep the engine running after the short thread is finished."""
+        for _ in range(10):
+            yield from schedule()
+
+    assert run([short, long]) == SimOk(), "must not deadlock"
+    assert polls_after_final == 0, "finished thread must not be polled"
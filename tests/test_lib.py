@@ -160,3 +160,14 @@ def test_channel_recv_blocks():
 
     assert run([thread]) == SimDeadlock(), "must block forever"
     assert steps == [True, False], "must not continue after blocking recv"
+
+
+def test_primitives_slots():
+    """Primitives must keep their state in slots, not in the instance dict."""
+    tx, rx = create_channel()
+    for obj in (Cell(0), Mutex(), tx, rx):
+        assert not hasattr(obj, "__dict__"), f"{obj} must be slotted"
+
+    cell: Cell[int] = Cell(0)
+    cell.val += 1
+    assert cell == Cell(1), "must still compare by value"
@@ -16,13 +16,17 @@
 
 from functools import partial
 
+import pytest
+
 from simsched.core import SimThread, schedule
-from simsched.engine import SimDeadlock, SimOk
+from simsched.engine import SimDeadlock, SimOk, SimTimeout
 from simsched.lib import Mutex
 from simsched.runner import (
     LoopController,
     RunStats,
+    ScheduleExplorer,
     simsched,
+    simsched_parallel,
     time_report_looper,
 )
 
@@ -115,3 +119,150 @@ def test_time_report_looper():
     assert len(env["oks"]) == 3
     assert env["oks"][0] < env["oks"][1] < env["oks"][2], "oks must increase"
     assert all(t >= 0.01 for t in env["times"]), "must keep interval"
+
+
+def test_run_stats_merge():
+    """Stats of independent simulations must be accumulated."""
+    stats = RunStats(total=3, ok=1, deadlock=1, timeout=1, last=SimOk())
+    stats.merge(RunStats(total=2, ok=1, panic=1, last=SimDeadlock()))
+    assert stats == RunStats(
+        total=5,
+        ok=2,
+        deadlock=1,
+        timeout=1,
+        panic=1,
+        last=SimDeadlock(),
+    )
+
+
+def simulate_task(nr_runs: int) -> tuple[RunStats, int]:
+    """Simulation task for worker processes, must be picklable."""
+
+    def looper(stats: RunStats) -> LoopController:
+        while stats.total < nr_runs:
+            yield
+
+    def thread() -> SimThread:
+        yield from schedule()
+
+    return simsched([thread, thread], looper), nr_runs
+
+
+def test_simsched_parallel():
+    """Results of all the worker tasks must be collected and stats merged."""
+    results: list[tuple[int, int]] = []
+
+    def collect(result: int, stats: RunStats) -> None:
+        results.append((result, stats.total))
+
+    stats = simsched_parallel(
+        simulate_task,
+        collect,
+        jobs=2,
+        runs_per_task=10,
+        rounds=3,
+    )
+
+    assert stats.total == stats.ok == 60
+    assert [result for result, _ in results] == [10] * 6
+    # the stats passed with each result are the running totals
+    assert [total for _, total in results] == list(range(10, 70, 10))
+
+
+def test_schedule_explorer():
+    """Explorer must visit every interleaving exactly once and stop."""
+    explorer = ScheduleExplorer()
+    trace: list[str] = []
+    traces: list[tuple[str, ...]] = []
+
+    def looper(stats: RunStats) -> LoopController:
+        """Collect the traces until all schedules are explored."""
+        while True:
+            yield
+            traces.append(tuple(trace))
+            trace.clear()
+            if not explorer.advance():
+                return
+
+    def thread(name: str) -> SimThread:
+        """Two steps with a scheduling point in between."""
+        trace.append(name)
+        yield from schedule()
+        trace.append(name)
+
+    stats = simsched(
+        [partial(thread, "a"), partial(thread, "b")],
+        looper,
+        chooser=explorer,
+    )
+
+    # all the ways to interleave two steps of each thread
+    assert sorted(traces) == [
+        ("a", "a", "b", "b"),
+        ("a", "b", "a", "b"),
+        ("a", "b", "b", "a"),
+        ("b", "a", "a", "b"),
+        ("b", "a", "b", "a"),
+        ("b", "b", "a", "a"),
+    ]
+    assert stats.total == stats.ok == len(traces)
+    assert explorer.schedules == len(traces)
+    assert explorer.done
+
+
+def test_schedule_explorer_budget():
+    """Explorer must fail when there are more schedules than the budget."""
+    explorer = ScheduleExplorer(max_schedules=5)
+
+    def looper(stats: RunStats) -> LoopController:
+        """Explore all the schedules."""
+        while True:
+            yield
+            if not explorer.advance():
+                return
+
+    def thread() -> SimThread:
+        """Two steps with a scheduling point in between, 6 schedules."""
+        yield from schedule()
+
+    with pytest.raises(RuntimeError, match="more than 5 schedules"):
+        simsched([thread, thread], looper, chooser=explorer)
+
+
+def test_schedule_explorer_nondeterministic():
+    """Explorer must fail when the replayed run does not match the path."""
+    explorer = ScheduleExplorer()
+    assert explorer(2) == 0
+    assert explorer.advance()
+    with pytest.raises(RuntimeError, match="deterministic"):
+        explorer(3)
+
+
+def test_schedule_explorer_timeout():
+    """Explorer must starve other threads with a spin loop till timeout."""
+    explorer = ScheduleExplorer()
+    flag = [False]
+
+    def looper(stats: RunStats) -> LoopController:
+        """Explore until some run does not complete."""
+        while True:
+            yield
+            if not isinstance(stats.last, SimOk) or not explorer.advance():
+                return
+
+    def spinner() -> SimThread:
+        """Spin until the flag is set."""
+        while not flag[0]:
+            yield from schedule()
+
+    def setter() -> SimThread:
+        """Set the flag."""
+        flag[0] = True
+        yield from schedule()
+
+    stats = simsched([spinner, setter], looper, chooser=explorer)
+
+    # the first runnable thread is always taken, so the setter never runs
+    assert not flag[0], "setter must be starved"
+    assert stats.total == stats.timeout == 1
+    assert isinstance(stats.last, SimTimeout)